@@ -1,6 +1,7 @@
 from fastapi import FastAPI, HTTPException, Security, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+import asyncio
 import os
 import logging
 from contextlib import asynccontextmanager
@@ -47,29 +48,37 @@ async def lifespan(app: FastAPI):
     memory.init_service(letta_client)
     search.init_services(embeddings_service, qdrant_client, indexing_service)
 
-    # Test connections
-    try:
-        await qdrant_client.health_check()
-        logger.info("✅ Qdrant client connected")
-    except Exception as e:
-        logger.error(f"❌ Qdrant connection failed: {e}")
-
-    try:
-        await letta_client.health_check()
-        logger.info("✅ Letta client connected")
-    except Exception as e:
-        logger.error(f"❌ Letta connection failed: {e}")
-
-    try:
-        await embeddings_service.health_check()
-        logger.info("✅ Embeddings service ready")
-    except Exception as e:
-        logger.error(f"❌ Embeddings service failed: {e}")
+    # Test connections concurrently so startup waits only for the slowest one
+    results = await asyncio.gather(
+        qdrant_client.health_check(),
+        letta_client.health_check(),
+        embeddings_service.health_check(),
+        return_exceptions=True,
+    )
+    for result, ready_message, failed_message in zip(
+        results,
+        (
+            "✅ Qdrant client connected",
+            "✅ Letta client connected",
+            "✅ Embeddings service ready",
+        ),
+        (
+            "❌ Qdrant connection failed",
+            "❌ Letta connection failed",
+            "❌ Embeddings service failed",
+        ),
+    ):
+        if isinstance(result, Exception):
+            logger.error(f"{failed_message}: {result}")
+        else:
+            logger.info(ready_message)
 
     yield
 
     # Cleanup
     logger.info("Shutting down Context Gateway...")
+    await letta_client.aclose()
+    await qdrant_client.aclose()
 
 
 # Create FastAPI app
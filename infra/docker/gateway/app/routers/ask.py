@@ -77,7 +77,7 @@ async def ask_rag(
         query_vector = embeddings_service.embed_query(request.query)
 
         # 2. Search Qdrant for relevant chunks
-        search_results = qdrant_client.search(
+        search_results = await qdrant_client.search(
             collection_name=request.repo or "default",
             query_vector=query_vector,
             limit=request.top_k,
@@ -1,3 +1,4 @@
+import heapq
 import json
 import logging
 import time
@@ -108,12 +109,13 @@ async def notes_operations(
                 if text_match or tag_match:
                     matching_notes.append(NoteInfo(**note_data))
 
-            # Sort by created_at (newest first)
-            matching_notes.sort(key=lambda x: x.created_at, reverse=True)
-
-            # Limit results
+            # Sort by created_at (newest first), keeping only the limit if set
             if request.limit:
-                matching_notes = matching_notes[: request.limit]
+                matching_notes = heapq.nlargest(
+                    request.limit, matching_notes, key=lambda x: x.created_at
+                )
+            else:
+                matching_notes.sort(key=lambda x: x.created_at, reverse=True)
 
             return NotesResponse(
                 success=True,
@@ -131,12 +133,13 @@ async def notes_operations(
 
                 matching_notes.append(NoteInfo(**note_data))
 
-            # Sort by created_at (newest first)
-            matching_notes.sort(key=lambda x: x.created_at, reverse=True)
-
-            # Limit results
+            # Sort by created_at (newest first), keeping only the limit if set
             if request.limit:
-                matching_notes = matching_notes[: request.limit]
+                matching_notes = heapq.nlargest(
+                    request.limit, matching_notes, key=lambda x: x.created_at
+                )
+            else:
+                matching_notes.sort(key=lambda x: x.created_at, reverse=True)
 
             return NotesResponse(
                 success=True,
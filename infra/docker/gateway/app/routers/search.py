@@ -55,7 +55,7 @@ async def vector_search(
         query_vector = embeddings_service.embed_query(request.query)
 
         # 2. Search Qdrant for similar vectors
-        search_results = qdrant_client.search(
+        search_results = await qdrant_client.search(
             collection_name=request.repo or "default",
             query_vector=query_vector,
             limit=request.top_k,
@@ -106,11 +106,11 @@ async def vector_search(
 async def list_collections() -> dict:
     """List all available collections"""
     try:
-        collections = qdrant_client.list_collections()
+        collections = await qdrant_client.list_collections()
         collection_info = {}
 
         for collection_name in collections:
-            info = qdrant_client.get_collection_info(collection_name)
+            info = await qdrant_client.get_collection_info(collection_name)
             if info:
                 collection_info[collection_name] = {
                     "points_count": info.get("points_count", 0),
@@ -131,7 +131,7 @@ async def get_collection_info(
 ) -> dict:
     """Get detailed information about a collection"""
     try:
-        info = qdrant_client.get_collection_info(collection_name)
+        info = await qdrant_client.get_collection_info(collection_name)
         if info:
             return info
         else:
@@ -157,7 +157,9 @@ async def index_repository(
 
     try:
         # Check if collection exists
-        collection_exists = qdrant_client.collection_exists(request.collection_name)
+        collection_exists = await qdrant_client.collection_exists(
+            request.collection_name
+        )
 
         if collection_exists and not request.force_reindex:
             return IndexResponse(
@@ -175,9 +177,11 @@ async def index_repository(
 
         # Create or recreate collection
         if collection_exists:
-            qdrant_client.delete_collection(request.collection_name)
+            await qdrant_client.delete_collection(request.collection_name)
 
-        if not qdrant_client.create_collection(request.collection_name, vector_size):
+        if not await qdrant_client.create_collection(
+            request.collection_name, vector_size
+        ):
             raise HTTPException(status_code=500, detail="Failed to create collection")
 
         # Index repository
@@ -205,7 +209,7 @@ async def index_repository(
             texts = [chunk["content"] for chunk in batch]
 
             try:
-                embeddings = embeddings_service.embed_texts(texts)
+                embeddings = embeddings_service.embed_texts(texts, use_cache=False)
 
                 for j, (chunk, embedding) in enumerate(zip(batch, embeddings)):
                     point = {
@@ -222,7 +226,9 @@ async def index_repository(
 
         # Store embeddings in Qdrant
         if all_points:
-            if not qdrant_client.upsert_points(request.collection_name, all_points):
+            if not await qdrant_client.upsert_points(
+                request.collection_name, all_points
+            ):
                 errors.append("Failed to store embeddings in Qdrant")
 
         indexing_time_ms = int((time.time() - start_time) * 1000)
@@ -251,7 +257,9 @@ async def reindex_changed_files(
 
     try:
         # Check if collection exists
-        if not qdrant_client.collection_exists(request.collection_name or request.repo):
+        if not await qdrant_client.collection_exists(
+            request.collection_name or request.repo
+        ):
             raise HTTPException(
                 status_code=404,
                 detail=f"Collection not found: {request.collection_name or request.repo}",
@@ -264,6 +272,7 @@ async def reindex_changed_files(
         errors = []
         points_to_add = []
         point_ids_to_delete = []
+        pending_chunks = []
 
         for file_path in request.changed:
             try:
@@ -272,26 +281,37 @@ async def reindex_changed_files(
                 # For now, we'll use a simple pattern
                 point_ids_to_delete.append(f"{file_path}:*")
 
-                # Chunk and embed the file
+                # Chunk the file; embedding happens in batches below
                 full_path = Path(f"/repos/{request.repo}/{file_path}")
                 if full_path.exists():
-                    file_chunks = indexing_service.chunk_file(full_path)
-                    texts = [chunk["content"] for chunk in file_chunks]
+                    pending_chunks.extend(indexing_service.chunk_file(full_path))
 
-                    if texts:
-                        embeddings = embeddings_service.embed_texts(texts)
+            except Exception as e:
+                error_msg = f"Failed to process file {file_path}: {e}"
+                logger.error(error_msg)
+                errors.append(error_msg)
 
-                        for chunk, embedding in zip(file_chunks, embeddings):
-                            point = {
-                                "id": chunk["id"],
-                                "vector": embedding,
-                                "payload": chunk.get("payload", {}),
-                            }
-                            points_to_add.append(point)
-                            chunks_processed += 1
+        # Embed chunks from all changed files together instead of one
+        # embeddings request per file
+        batch_size = 100
+        for i in range(0, len(pending_chunks), batch_size):
+            batch = pending_chunks[i : i + batch_size]
+            texts = [chunk["content"] for chunk in batch]
+
+            try:
+                embeddings = embeddings_service.embed_texts(texts)
+
+                for chunk, embedding in zip(batch, embeddings):
+                    point = {
+                        "id": chunk["id"],
+                        "vector": embedding,
+                        "payload": chunk.get("payload", {}),
+                    }
+                    points_to_add.append(point)
+                    chunks_processed += 1
 
             except Exception as e:
-                error_msg = f"Failed to process file {file_path}: {e}"
+                error_msg = f"Failed to embed batch {i // batch_size}: {e}"
                 logger.error(error_msg)
                 errors.append(error_msg)
 
@@ -304,7 +324,7 @@ async def reindex_changed_files(
 
         # Add new points
         if points_to_add:
-            if not qdrant_client.upsert_points(collection_name, points_to_add):
+            if not await qdrant_client.upsert_points(collection_name, points_to_add):
                 errors.append("Failed to store new embeddings in Qdrant")
 
         indexing_time_ms = int((time.time() - start_time) * 1000)
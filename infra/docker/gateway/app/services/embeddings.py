@@ -1,6 +1,10 @@
+import asyncio
+import hashlib
 import os
 import logging
-from typing import List
+from array import array
+from collections import OrderedDict
+from typing import Dict, List
 from openai import OpenAI
 
 logger = logging.getLogger(__name__)
@@ -15,6 +19,17 @@ class EmbeddingsService:
             "OPENAI_BASE_URL", "https://api.z.ai/api/coding/paas/v4"
         )
         self.model = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+        self.query_cache_size = int(os.getenv("EMBEDDING_CACHE_SIZE", "4096"))
+        self.text_cache_size = int(os.getenv("EMBEDDING_TEXT_CACHE_SIZE", "2048"))
+
+        # Query text -> embedding, least recently used first. Vectors are kept
+        # as float32 arrays (~6 KB at 1536 dims vs ~48 KB as a list of floats)
+        self._query_cache: "OrderedDict[str, array]" = OrderedDict()
+        # Content digest -> float32 embedding of a recently embedded chunk, least
+        # recently used first. Sized for /search/reindex, where unchanged chunks
+        # of edited files come back; a full re-index of a repository with more
+        # chunks than this cycles through the cache without hits
+        self._text_cache: "OrderedDict[bytes, array]" = OrderedDict()
 
         if not self.api_key:
             raise ValueError("OPENAI_API_KEY environment variable is required")
@@ -27,9 +42,13 @@ class EmbeddingsService:
     async def health_check(self) -> bool:
         """Check if embeddings service is working"""
         try:
-            # Test with a simple embedding
-            response = self.client.embeddings.create(
-                model=self.model, input="test", encoding_format="float"
+            # Test with a simple embedding, off the event loop since the
+            # OpenAI client is synchronous
+            response = await asyncio.to_thread(
+                self.client.embeddings.create,
+                model=self.model,
+                input="test",
+                encoding_format="float",
             )
             return len(response.data[0].embedding) > 0
         except Exception as e:
@@ -38,25 +57,82 @@ class EmbeddingsService:
 
     def embed_query(self, text: str) -> List[float]:
         """Generate embedding for a single query text"""
+        cached = self._query_cache.get(text)
+        if cached is not None:
+            self._query_cache.move_to_end(text)
+            return cached.tolist()
+
         try:
             response = self.client.embeddings.create(
                 model=self.model, input=text, encoding_format="float"
             )
-            return response.data[0].embedding
+            embedding = response.data[0].embedding
         except Exception as e:
             logger.error(f"Failed to embed query: {e}")
             raise
 
-    def embed_texts(self, texts: List[str]) -> List[List[float]]:
-        """Generate embeddings for multiple texts (batch processing)"""
+        if self.query_cache_size > 0:
+            if len(self._query_cache) >= self.query_cache_size:
+                self._query_cache.popitem(last=False)
+            self._query_cache[text] = array("f", embedding)
+
+        return embedding
+
+    def embed_texts(
+        self, texts: List[str], use_cache: bool = True
+    ) -> List[List[float]]:
+        """Generate embeddings for multiple texts (batch processing)
+
+        Pass use_cache=False for one-off bulk work such as a full index, which
+        would only churn the cache without ever hitting it.
+        """
+        if not use_cache:
+            return self._create_embeddings(texts)
+
+        # Chunks whose content was embedded recently (e.g. unchanged parts of a
+        # reindexed file) are served from the cache; only the rest hit the API
+        keys = [
+            hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+            for text in texts
+        ]
+        missing: Dict[bytes, str] = {}
+        for key, text in zip(keys, texts):
+            if key in self._text_cache:
+                self._text_cache.move_to_end(key)
+            else:
+                missing.setdefault(key, text)
+
+        fetched: Dict[bytes, List[float]] = {}
+        if missing:
+            fetched = dict(
+                zip(missing, self._create_embeddings(list(missing.values())))
+            )
+
+        embeddings = [
+            fetched[key] if key in fetched else self._text_cache[key].tolist()
+            for key in keys
+        ]
+
+        if self.text_cache_size > 0:
+            for key, embedding in fetched.items():
+                self._text_cache[key] = array("f", embedding)
+            while len(self._text_cache) > self.text_cache_size:
+                self._text_cache.popitem(last=False)
+
+        return embeddings
+
+    def _create_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts with a single API call"""
         try:
             response = self.client.embeddings.create(
-                model=self.model, input=texts, encoding_format="float"
+                model=self.model,
+                input=texts,
+                encoding_format="float",
             )
-            return [data.embedding for data in response.data]
         except Exception as e:
             logger.error(f"Failed to embed texts: {e}")
             raise
+        return [data.embedding for data in response.data]
 
     def get_embedding_dimension(self) -> int:
         """Get the dimension of embeddings"""
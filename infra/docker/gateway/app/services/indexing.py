@@ -1,49 +1,178 @@
+import asyncio
+import fnmatch
+import hashlib
+import json
+import os
 import re
 import logging
+import multiprocessing
 import time
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Iterator, Tuple
 from pathlib import Path
 import ast
+from collections import deque
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
 
 logger = logging.getLogger(__name__)
 
+# Source files chunked by functions/classes (Python) or by lines
+_CODE_EXTENSIONS = frozenset(
+    {
+        ".py",
+        ".js",
+        ".ts",
+        ".java",
+        ".cpp",
+        ".c",
+        ".h",
+        ".hpp",
+        ".cs",
+        ".go",
+        ".rs",
+        ".swift",
+        ".kt",
+        ".scala",
+        ".rb",
+        ".php",
+    }
+)
+
+# Prose files chunked by markdown sections
+_TEXT_EXTENSIONS = frozenset({".md", ".txt", ".rst", ".adoc"})
+
+# Plain/config files below this size are kept as a single chunk
+_PLAIN_FILE_MAX_CHARS = 5000
+
+# Bump when _python_definitions changes what it extracts, so entries written
+# by an older version are ignored (and pruned) instead of served
+_AST_CACHE_VERSION = 1
+
+
+def _glob_part_regex(part: str) -> str:
+    """Regex for one path component of a glob pattern, as fnmatch reads it"""
+    out = []
+    i = 0
+    while i < len(part):
+        c = part[i]
+        i += 1
+        if c == "*":
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "[":
+            j = i
+            if j < len(part) and part[j] == "!":
+                j += 1
+            if j < len(part) and part[j] == "]":
+                j += 1
+            j = part.find("]", j)
+            if j == -1:
+                out.append(re.escape(c))
+            else:
+                # fnmatch translates the class itself (negation, ranges,
+                # escaping); PurePath.match compares one component at a time,
+                # so the class must also never match the separator
+                class_regex = fnmatch.translate(part[i - 1 : j + 1])[4:-3]
+                out.append(f"(?!/){class_regex}")
+                i = j + 1
+        else:
+            out.append(re.escape(c))
+    return "".join(out)
+
+
+def _exclude_regex(patterns: Iterable[str], match_globs: bool = True) -> re.Pattern:
+    """Compile exclude patterns into a single regex searched against a path
+
+    A path is excluded when a pattern occurs in it as a substring, or (with
+    match_globs) when the path matches it the way PurePath.match does.
+    """
+    alternatives = []
+    for pattern in patterns:
+        alternatives.append(re.escape(pattern))
+        parts = [p for p in pattern.split("/") if p and p != "."]
+        if match_globs and parts:
+            anchor = r"\A/" if pattern.startswith("/") else r"(?:\A|/)"
+            body = "/".join(_glob_part_regex(p) for p in parts)
+            alternatives.append(f"{anchor}{body}\\Z")
+    return re.compile("|".join(alternatives) or r"(?!)")
+
+
+def _available_cpus() -> int:
+    """CPUs this process may run on (respects container cpusets)"""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+# Indexing workers start from a clean server process instead of forking the
+# multithreaded gateway (executor, gRPC threads), which can deadlock
+_WORKER_CONTEXT = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
+
+def _chunk_file_with_metadata(
+    service: "IndexingService", file_path: Path
+) -> List[Dict[str, Any]]:
+    """Chunk a file and attach metadata (runs in a worker process)"""
+    chunks = service.chunk_file(file_path)
+    for chunk in chunks:
+        chunk.update({"payload": service.extract_metadata(file_path, chunk)})
+    return chunks
+
 
 class IndexingService:
     """Service for indexing repositories into Qdrant"""
 
     def __init__(self):
-        self.supported_extensions = {
-            ".py",
-            ".js",
-            ".ts",
-            ".java",
-            ".cpp",
-            ".c",
-            ".h",
-            ".hpp",
-            ".cs",
-            ".go",
-            ".rs",
-            ".swift",
-            ".kt",
-            ".scala",
-            ".rb",
-            ".php",
-            ".md",
-            ".txt",
-            ".rst",
-            ".adoc",
-            ".yml",
-            ".yaml",
-            ".json",
-            ".toml",
-            ".cfg",
-            ".ini",
-            ".conf",
-            ".sh",
-            ".bat",
-            ".ps1",
-        }
+        # Worker processes used to chunk files during full indexing
+        self.max_workers = int(os.getenv("INDEXING_WORKERS", "0")) or _available_cpus()
+
+        # On-disk cache of parsed Python definitions, keyed by content hash
+        self.ast_cache_dir = os.getenv("AST_CACHE_DIR", "/app/data/ast_cache")
+        if self.ast_cache_dir:
+            try:
+                os.makedirs(self.ast_cache_dir, exist_ok=True)
+            except OSError as e:
+                logger.warning(f"AST cache disabled, cannot create directory: {e}")
+                self.ast_cache_dir = None
+        self.ast_cache_max_entries = int(os.getenv("AST_CACHE_MAX_ENTRIES", "50000"))
+
+        self.supported_extensions = frozenset(
+            {
+                ".py",
+                ".js",
+                ".ts",
+                ".java",
+                ".cpp",
+                ".c",
+                ".h",
+                ".hpp",
+                ".cs",
+                ".go",
+                ".rs",
+                ".swift",
+                ".kt",
+                ".scala",
+                ".rb",
+                ".php",
+                ".md",
+                ".txt",
+                ".rst",
+                ".adoc",
+                ".yml",
+                ".yaml",
+                ".json",
+                ".toml",
+                ".cfg",
+                ".ini",
+                ".conf",
+                ".sh",
+                ".bat",
+                ".ps1",
+            }
+        )
 
         # Patterns to exclude
         self.exclude_patterns = [
@@ -65,6 +194,7 @@ class IndexingService:
             "*.pyo",
             "*.pyd",
         ]
+        self._exclude_re = _exclude_regex(self.exclude_patterns)
 
     def is_indexable_file(self, file_path: Path) -> bool:
         """Check if file should be indexed"""
@@ -77,10 +207,8 @@ class IndexingService:
             return False
 
         # Check exclude patterns
-        file_str = str(file_path)
-        for pattern in self.exclude_patterns:
-            if pattern in file_str or file_path.match(pattern):
-                return False
+        if self._exclude_re.search(str(file_path)):
+            return False
 
         # Check file size (skip very large files > 1MB)
         try:
@@ -91,6 +219,45 @@ class IndexingService:
 
         return True
 
+    def _scan_files(
+        self, root: str, exclude_re: re.Pattern, prune_re: re.Pattern
+    ) -> Iterator[Path]:
+        """Walk a directory tree with os.scandir, yielding indexable files"""
+        pending = [root]
+        while pending:
+            directory = pending.pop()
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            # Exclude patterns match as substrings of the path,
+                            # so a matching directory excludes everything below
+                            # it; don't descend into it at all
+                            if not prune_re.search(entry.path):
+                                pending.append(entry.path)
+                            continue
+
+                        # Cheap name-based checks before any stat call
+                        ext = os.path.splitext(entry.name)[1].lower()
+                        if ext not in self.supported_extensions:
+                            continue
+
+                        if exclude_re.search(entry.path):
+                            continue
+
+                        # Skip very large files > 1MB
+                        try:
+                            if not entry.is_file():
+                                continue
+                            if entry.stat().st_size > 1024 * 1024:
+                                continue
+                        except OSError:
+                            continue
+
+                        yield Path(entry.path)
+            except OSError as e:
+                logger.warning(f"Failed to scan directory {directory}: {e}")
+
     def discover_files(
         self,
         repo_path: str,
@@ -102,41 +269,29 @@ class IndexingService:
         if not repo.exists():
             raise ValueError(f"Repository path does not exist: {repo_path}")
 
-        files = []
-
-        # Custom file patterns
-        include_patterns = file_patterns or ["**/*"]
-        exclude_patterns = exclude_patterns or self.exclude_patterns
-
-        for pattern in include_patterns:
-            for file_path in repo.glob(pattern):
-                if self.is_indexable_file(file_path):
-                    # Check custom exclude patterns
-                    should_exclude = False
-                    file_str = str(file_path)
-                    for excl_pattern in exclude_patterns:
-                        if excl_pattern in file_str or file_path.match(excl_pattern):
-                            should_exclude = True
-                            break
-
-                    if not should_exclude:
-                        files.append(file_path)
+        # Built-in excludes always apply; custom ones are checked on top
+        patterns = list(dict.fromkeys(self.exclude_patterns + (exclude_patterns or [])))
+        exclude_re = _exclude_regex(patterns)
+
+        if file_patterns:
+            # Custom file patterns
+            files = [
+                file_path
+                for pattern in file_patterns
+                for file_path in repo.glob(pattern)
+                if self.is_indexable_file(file_path)
+                and not exclude_re.search(str(file_path))
+            ]
+        else:
+            # Substring matches on a directory also exclude everything below it
+            prune_re = _exclude_regex(patterns, match_globs=False)
+            files = list(self._scan_files(str(repo), exclude_re, prune_re))
 
         logger.info(f"Discovered {len(files)} indexable files in {repo_path}")
         return files
 
     def chunk_file(self, file_path: Path) -> List[Dict[str, Any]]:
         """Chunk a file into manageable pieces"""
-        try:
-            with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-                content = f.read()
-        except Exception as e:
-            logger.error(f"Failed to read file {file_path}: {e}")
-            return []
-
-        if not content.strip():
-            return []
-
         # Get relative path from repo root
         relative_path = str(
             file_path.relative_to(
@@ -147,91 +302,202 @@ class IndexingService:
         )
         file_ext = file_path.suffix.lower()
 
+        try:
+            # Non-Python code is only ever chunked by lines, so stream it
+            # rather than reading the whole file into memory first
+            if file_ext in _CODE_EXTENSIONS and file_path.suffix != ".py":
+                return self._chunk_by_lines(
+                    self._iter_lines(file_path), relative_path, file_path
+                )
+
+            with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
+                content = f.read()
+        except Exception as e:
+            logger.error(f"Failed to read file {file_path}: {e}")
+            return []
+
+        if not content.strip():
+            return []
+
         # Different chunking strategies based on file type
-        if file_ext in [
-            ".py",
-            ".js",
-            ".ts",
-            ".java",
-            ".cpp",
-            ".c",
-            ".h",
-            ".hpp",
-            ".cs",
-            ".go",
-            ".rs",
-            ".swift",
-            ".kt",
-            ".scala",
-            ".rb",
-            ".php",
-        ]:
+        if file_ext in _CODE_EXTENSIONS:
             return self._chunk_code_file(content, relative_path, file_path)
-        elif file_ext in [".md", ".txt", ".rst", ".adoc"]:
+        elif file_ext in _TEXT_EXTENSIONS:
             return self._chunk_markdown_file(content, relative_path, file_path)
         else:
             return self._chunk_plain_file(content, relative_path, file_path)
 
+    def _iter_lines(self, file_path: Path) -> Iterator[str]:
+        """Yield a file's lines without newlines, as content.split("\n") would"""
+        line = ""
+        with open(
+            file_path, "r", encoding="utf-8", errors="ignore", buffering=1 << 20
+        ) as f:
+            for line in f:
+                yield line[:-1] if line.endswith("\n") else line
+
+        # split() also produces an empty last line after a trailing newline
+        if not line or line.endswith("\n"):
+            yield ""
+
     def _chunk_code_file(
         self, content: str, relative_path: str, file_path: Path
     ) -> List[Dict[str, Any]]:
-        """Chunk code files by functions/classes"""
-        chunks = []
-        lines = content.split("\n")
+        """Chunk a Python file by functions/classes
 
-        # Try to parse as Python for function/class extraction
-        if file_path.suffix == ".py":
+        Other code files never get here: chunk_file streams them straight
+        into _chunk_by_lines.
+        """
+        try:
+            definitions = self._python_definitions(content)
+            return self._extract_python_chunks(definitions, content, relative_path)
+        except Exception as e:
+            logger.warning(f"Failed to parse Python file {relative_path}: {e}")
+            # Fallback to line-based chunking
+            return self._chunk_by_lines(content.split("\n"), relative_path, file_path)
+
+    def _line_starts(self, content: str) -> List[int]:
+        """Character offset of the start of every line in content"""
+        starts = [0]
+        pos = content.find("\n")
+        while pos != -1:
+            starts.append(pos + 1)
+            pos = content.find("\n", pos + 1)
+        return starts
+
+    def _python_definitions(self, content: str) -> List[Tuple[str, str, int, int]]:
+        """Parse Python source into (type, name, start, end) definition spans
+
+        Spans are cached on disk by content hash, so unchanged files skip
+        ast.parse entirely when a repository is indexed again.
+        """
+        cache_path = None
+        if self.ast_cache_dir:
+            digest = hashlib.blake2b(
+                content.encode("utf-8"), digest_size=16
+            ).hexdigest()
+            cache_path = os.path.join(
+                self.ast_cache_dir, f"v{_AST_CACHE_VERSION}-{digest}.json"
+            )
             try:
-                tree = ast.parse(content)
-                chunks.extend(self._extract_python_chunks(tree, lines, relative_path))
-            except Exception as e:
-                logger.warning(f"Failed to parse Python file {relative_path}: {e}")
-                # Fallback to line-based chunking
-                chunks.extend(self._chunk_by_lines(content, relative_path, file_path))
-        else:
-            # For other languages, use simple line-based chunking
-            chunks.extend(self._chunk_by_lines(content, relative_path, file_path))
+                with open(cache_path, "r", encoding="utf-8") as f:
+                    definitions = [tuple(d) for d in json.load(f)]
+                # Mark as recently used so pruning keeps it
+                os.utime(cache_path)
+                return definitions
+            except (OSError, ValueError):
+                pass
+
+        tree = ast.parse(content)
+        num_lines = content.count("\n") + 1
+        definitions = []
+
+        # Definitions only occur in statement bodies, so walk those instead
+        # of every expression node like ast.walk would
+        pending = deque(tree.body)
+        while pending:
+            node = pending.popleft()
+            for field in ("body", "orelse", "finalbody", "handlers", "cases"):
+                pending.extend(getattr(node, field, ()))
 
-        return chunks
-
-    def _extract_python_chunks(
-        self, tree: ast.AST, lines: List[str], relative_path: str
-    ) -> List[Dict[str, Any]]:
-        """Extract functions and classes from Python AST"""
-        chunks = []
-
-        for node in ast.walk(tree):
             if isinstance(node, (ast.FunctionDef, ast.ClassDef, ast.AsyncFunctionDef)):
                 start_line = node.lineno - 1  # 0-based
                 end_line = (
                     node.end_lineno - 1
-                    if hasattr(node, "end_lineno")
-                    else min(start_line + 20, len(lines) - 1)
+                    if getattr(node, "end_lineno", None) is not None
+                    else min(start_line + 20, num_lines - 1)
                 )
-
-                if start_line < len(lines):
-                    chunk_lines = lines[start_line : end_line + 1]
-                    chunk_content = "\n".join(chunk_lines)
-
-                    # Add context lines before and after
-                    context_start = max(0, start_line - 3)
-                    context_end = min(len(lines), end_line + 3)
-                    context_lines = lines[context_start : context_end + 1]
-                    context_content = "\n".join(context_lines)
-
-                    chunks.append(
-                        {
-                            "id": f"{relative_path}:{start_line}-{end_line}",
-                            "content": context_content,
-                            "start_line": context_start + 1,  # 1-based for display
-                            "end_line": context_end + 1,
-                            "type": "function"
-                            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))
-                            else "class",
-                            "name": node.name,
-                            "language": "python",
-                        }
+                definitions.append(
+                    (
+                        "function"
+                        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))
+                        else "class",
+                        node.name,
+                        start_line,
+                        end_line,
                     )
+                )
+
+        if cache_path:
+            # Write then rename so concurrent indexing workers never see a
+            # partially written entry
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(definitions, f)
+                os.replace(tmp_path, cache_path)
+            except OSError as e:
+                logger.warning(f"Failed to write AST cache entry: {e}")
+
+        return definitions
+
+    def _prune_ast_cache(self):
+        """Drop stale-version entries and the least recently used beyond the limit"""
+        prefix = f"v{_AST_CACHE_VERSION}-"
+        entries = []
+        try:
+            with os.scandir(self.ast_cache_dir) as it:
+                for entry in it:
+                    # Leave other files alone, e.g. entries still being written
+                    if not entry.name.endswith(".json"):
+                        continue
+                    try:
+                        if entry.name.startswith(prefix):
+                            entries.append((entry.stat().st_mtime, entry.path))
+                        else:
+                            os.remove(entry.path)
+                    except OSError:
+                        continue
+        except OSError as e:
+            logger.warning(f"Failed to prune AST cache: {e}")
+            return
+
+        excess = len(entries) - self.ast_cache_max_entries
+        if excess > 0:
+            entries.sort()
+            for _, path in entries[:excess]:
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+
+    def _extract_python_chunks(
+        self,
+        definitions: List[Tuple[str, str, int, int]],
+        content: str,
+        relative_path: str,
+    ) -> List[Dict[str, Any]]:
+        """Build chunks for Python functions and classes"""
+        chunks = []
+        line_starts = self._line_starts(content)
+        num_lines = len(line_starts)
+
+        for chunk_type, name, start_line, end_line in definitions:
+            if start_line < num_lines:
+                # Add context lines before and after
+                context_start = max(0, start_line - 3)
+                context_end = min(num_lines, end_line + 3)
+
+                # Slice straight out of content rather than splitting and
+                # re-joining lines for every definition
+                if context_end + 1 < num_lines:
+                    context_content = content[
+                        line_starts[context_start] : line_starts[context_end + 1] - 1
+                    ]
+                else:
+                    context_content = content[line_starts[context_start] :]
+
+                chunks.append(
+                    {
+                        "id": f"{relative_path}:{start_line}-{end_line}",
+                        "content": context_content,
+                        "start_line": context_start + 1,  # 1-based for display
+                        "end_line": context_end + 1,
+                        "type": chunk_type,
+                        "name": name,
+                        "language": "python",
+                    }
+                )
 
         return chunks
 
@@ -248,7 +514,15 @@ class IndexingService:
         start_line = 0
 
         for i, line in enumerate(lines):
-            if re.match(r"^#{1,6}\s+(.+)$", line):
+            # ATX header: 1-6 '#', whitespace, then text (same as the regex
+            # ^#{1,6}\s+(.+)$, without running it on every line)
+            is_header = False
+            if line.startswith("#"):
+                level = len(line) - len(line.lstrip("#"))
+                rest = line[level:]
+                is_header = level <= 6 and len(rest) > 1 and rest[0].isspace()
+
+            if is_header:
                 # Save previous section if it has content
                 if current_section:
                     section_content = "\n".join(current_section)
@@ -267,7 +541,7 @@ class IndexingService:
 
                 # Start new section
                 current_section = [line]
-                current_header = re.sub(r"^#{1,6}\s+", "", line).strip()
+                current_header = rest.strip()
                 start_line = i
             else:
                 current_section.append(line)
@@ -291,19 +565,16 @@ class IndexingService:
         return chunks
 
     def _chunk_by_lines(
-        self, content: str, relative_path: str, file_path: Path
+        self, lines: Iterable[str], relative_path: str, file_path: Path
     ) -> List[Dict[str, Any]]:
         """Generic chunking by lines with overlap"""
         chunks = []
-        lines = content.split("\n")
         chunk_size = 50  # lines per chunk
         overlap = 5  # overlapping lines
+        language = file_path.suffix[1:] if file_path.suffix else "text"
 
-        for start in range(0, len(lines), chunk_size - overlap):
-            end = min(start + chunk_size, len(lines))
-            chunk_lines = lines[start:end]
+        def add_chunk(start: int, end: int, chunk_lines: Iterable[str]):
             chunk_content = "\n".join(chunk_lines)
-
             if len(chunk_content.strip()) > 20:  # Skip very short chunks
                 chunks.append(
                     {
@@ -312,12 +583,31 @@ class IndexingService:
                         "start_line": start + 1,
                         "end_line": end,
                         "type": "chunk",
-                        "language": file_path.suffix[1:]
-                        if file_path.suffix
-                        else "text",
+                        "language": language,
                     }
                 )
 
+        # Slide a window over the lines, emitting a chunk each time it fills
+        # up at a chunk boundary
+        window = deque(maxlen=chunk_size)
+        num_lines = 0
+        start = 0
+        for line in lines:
+            window.append(line)
+            num_lines += 1
+            if num_lines == start + chunk_size:
+                add_chunk(start, num_lines, window)
+                start += chunk_size - overlap
+
+        # Chunks still open at the end of the file run to its last line
+        while start < num_lines:
+            add_chunk(
+                start,
+                num_lines,
+                islice(window, len(window) - (num_lines - start), None),
+            )
+            start += chunk_size - overlap
+
         return chunks
 
     def _chunk_plain_file(
@@ -327,7 +617,7 @@ class IndexingService:
         chunks = []
 
         # For config files, keep whole file as one chunk if not too large
-        if len(content) < 5000:  # Less than ~5KB
+        if len(content) < _PLAIN_FILE_MAX_CHARS:  # Less than ~5KB
             chunks.append(
                 {
                     "id": f"{relative_path}:0-0",
@@ -340,7 +630,9 @@ class IndexingService:
             )
         else:
             # Split larger files
-            chunks.extend(self._chunk_by_lines(content, relative_path, file_path))
+            chunks.extend(
+                self._chunk_by_lines(content.split("\n"), relative_path, file_path)
+            )
 
         return chunks
 
@@ -384,30 +676,49 @@ class IndexingService:
                     "files_processed": 0,
                 }
 
-            # Process all files and create chunks
+            # Process all files and create chunks, spreading the parsing and
+            # chunking across worker processes
             all_chunks = []
             total_files = len(files)
             processed_files = 0
 
-            for file_path in files:
-                try:
-                    file_chunks = self.chunk_file(file_path)
-                    for chunk in file_chunks:
-                        # Add metadata
-                        metadata = self.extract_metadata(file_path, chunk)
-                        chunk.update({"payload": metadata})
-                        all_chunks.append(chunk)
-
-                    processed_files += 1
-
-                    if processed_files % 10 == 0:
-                        logger.info(
-                            f"Processed {processed_files}/{total_files} files, {len(all_chunks)} chunks so far"
-                        )
-
-                except Exception as e:
-                    logger.error(f"Failed to process file {file_path}: {e}")
-                    continue
+            loop = asyncio.get_running_loop()
+            max_workers = max(1, min(self.max_workers or 1, total_files))
+            executor = ProcessPoolExecutor(
+                max_workers=max_workers, mp_context=_WORKER_CONTEXT
+            )
+            completed = False
+            try:
+                futures = [
+                    loop.run_in_executor(
+                        executor, _chunk_file_with_metadata, self, file_path
+                    )
+                    for file_path in files
+                ]
+
+                # Await in submission order so chunk order stays deterministic
+                for file_path, future in zip(files, futures):
+                    try:
+                        all_chunks.extend(await future)
+                        processed_files += 1
+
+                        if processed_files % 100 == 0:
+                            logger.info(
+                                f"Processed {processed_files}/{total_files} files, {len(all_chunks)} chunks so far"
+                            )
+
+                    except Exception as e:
+                        logger.error(f"Failed to process file {file_path}: {e}")
+                        continue
+
+                completed = True
+            finally:
+                # If the request is cancelled mid-index, drop the queued files
+                # instead of blocking the event loop until they are chunked
+                executor.shutdown(wait=completed, cancel_futures=not completed)
+
+            if self.ast_cache_dir:
+                await loop.run_in_executor(None, self._prune_ast_cache)
 
             indexing_time_ms = int((time.time() - start_time) * 1000)
 
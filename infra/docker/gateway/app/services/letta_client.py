@@ -1,179 +1,256 @@
+import asyncio
+import importlib.util
 import os
 import logging
-from typing import Dict, Any, Optional
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Iterable, Optional, Tuple
 import httpx
 
+try:
+    # orjson decodes large responses (agent lists, search results) faster
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
 logger = logging.getLogger(__name__)
 
+_MISSING = object()
+
 
 class LettaClient:
-    """Client for Letta agent memory operations"""
+    """Client for Letta agent memory operations
+
+    get_memory/get_agent can be served from an in-process TTL cache
+    (LETTA_CACHE_TTL seconds, off by default). The cache only sees writes
+    made through this client: changes from other Letta clients (e.g. the MCP
+    server) or made by agents themselves show up once entries expire.
+    """
 
     def __init__(self):
         self.base_url = os.getenv("LETTA_URL", "http://letta:8283")
         self.api_key = os.getenv("OPENAI_API_KEY")  # Letta uses same API key
+        self.cache_ttl = float(os.getenv("LETTA_CACHE_TTL", "0"))
+        self.cache_size = int(os.getenv("LETTA_CACHE_SIZE", "10000"))
+
+        # (kind, agent_id[, key]) -> (expiry, value) for get_memory/get_agent,
+        # least recently used first
+        self._cache: "OrderedDict[Tuple[str, ...], Tuple[float, Any]]" = OrderedDict()
+        # agent_id -> sequence number of its latest write (memory change or
+        # message), most recent last. A read only fills the cache if no write
+        # to its agent happened while it was in flight, so a slow GET can't
+        # re-cache a value a write just replaced. Agents evicted from this map
+        # fall back to _generation_floor, which is at least their last write.
+        self._generations: "OrderedDict[str, int]" = OrderedDict()
+        self._generation_floor = 0
+        self._write_seq = 0
+
+        # Shared client so every call reuses pooled keep-alive connections
+        # instead of opening a new one per request. HTTP/2 (negotiated over
+        # TLS) lets concurrent calls multiplex on a single connection; it
+        # needs the optional h2 package (httpx[http2]).
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            http2=importlib.util.find_spec("h2") is not None,
+            timeout=10.0,
+            limits=httpx.Limits(max_keepalive_connections=50, max_connections=100),
+        )
 
         logger.info(f"Initialized Letta client with URL: {self.base_url}")
 
+    async def aclose(self):
+        """Close pooled connections (called on shutdown)"""
+        await self._client.aclose()
+
+    def _cache_get(self, cache_key: Tuple[str, ...]) -> Any:
+        """Return a cached read, or _MISSING if absent or expired"""
+        entry = self._cache.get(cache_key)
+        if entry is None:
+            return _MISSING
+        if entry[0] < time.monotonic():
+            del self._cache[cache_key]
+            return _MISSING
+        self._cache.move_to_end(cache_key)
+        return entry[1]
+
+    def _cache_put(self, cache_key: Tuple[str, ...], value: Any, generation: int):
+        """Cache a successful read, evicting the least recently used entry
+
+        generation is _generation(agent_id) from when the read started.
+        """
+        if self.cache_size <= 0 or self.cache_ttl <= 0:
+            return
+        if self._generation(cache_key[1]) != generation:
+            return
+        self._cache[cache_key] = (time.monotonic() + self.cache_ttl, value)
+        self._cache.move_to_end(cache_key)
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _generation(self, agent_id: str) -> int:
+        """Sequence number of the latest write to agent_id"""
+        return self._generations.get(agent_id, self._generation_floor)
+
+    def _invalidate(self, agent_id: str, *cache_keys: Tuple[str, ...]):
+        """Record a write to agent_id and drop the affected cached reads"""
+        self._write_seq += 1
+        self._generations[agent_id] = self._write_seq
+        self._generations.move_to_end(agent_id)
+        if len(self._generations) > max(self.cache_size, 1):
+            _, self._generation_floor = self._generations.popitem(last=False)
+        for cache_key in cache_keys:
+            self._cache.pop(cache_key, None)
+
+    async def _request(
+        self, method: str, path: str, action: str, **kwargs
+    ) -> Optional[httpx.Response]:
+        """Send a request to Letta, returning None (after logging) on failure"""
+        try:
+            response = await self._client.request(method, path, **kwargs)
+            response.raise_for_status()
+            return response
+        except httpx.HTTPStatusError as e:
+            logger.error(f"Failed to {action}: {e.response.status_code}")
+        except httpx.TimeoutException:
+            logger.warning(f"Letta timeout while trying to {action}: {path}")
+        except httpx.HTTPError as e:
+            logger.warning(f"Failed to {action}: {e}")
+        return None
+
     async def health_check(self) -> bool:
         """Check if Letta is accessible"""
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(f"{self.base_url}/v1/health/", timeout=10.0)
-                if response.status_code == 200:
-                    data = response.json()
-                    logger.info(f"Letta health check passed: {data.get('status')}")
-                    return True
-                else:
-                    logger.error(
-                        f"Letta health check failed with status: {response.status_code}"
-                    )
-                    return False
-        except Exception as e:
-            logger.error(f"Letta health check failed: {e}")
+        response = await self._request("GET", "/v1/health/", "check Letta health")
+        if response is None:
             return False
+        data = json_loads(response.content)
+        logger.info(f"Letta health check passed: {data.get('status')}")
+        return True
 
     async def get_memory(self, agent_id: str, key: str) -> Optional[Any]:
         """Get memory value for agent"""
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.base_url}/v1/agents/{agent_id}/memory",
-                    params={"key": key},
-                    timeout=10.0,
-                )
-                if response.status_code == 200:
-                    data = response.json()
-                    return data.get("value")
-                else:
-                    logger.error(f"Failed to get memory: {response.status_code}")
-                    return None
-        except Exception as e:
-            logger.error(f"Failed to get memory: {e}")
+        cache_key = ("memory", agent_id, key)
+        value = self._cache_get(cache_key)
+        if value is not _MISSING:
+            return value
+        generation = self._generation(agent_id)
+
+        response = await self._request(
+            "GET", f"/v1/agents/{agent_id}/memory", "get memory", params={"key": key}
+        )
+        if response is None:
             return None
+        value = json_loads(response.content).get("value")
+        self._cache_put(cache_key, value, generation)
+        return value
+
+    async def get_memory_many(
+        self, agent_id: str, keys: Iterable[str]
+    ) -> Dict[str, Optional[Any]]:
+        """Get several memory values for agent concurrently
+
+        Keys that are missing or fail to load map to None; one bad key does
+        not lose the others.
+        """
+        keys = list(dict.fromkeys(keys))
+        values = await asyncio.gather(
+            *(self.get_memory(agent_id, k) for k in keys), return_exceptions=True
+        )
+        result = {}
+        for key, value in zip(keys, values):
+            if isinstance(value, Exception):
+                logger.error(f"Failed to get memory {key}: {value}")
+                value = None
+            result[key] = value
+        return result
 
     async def put_memory(self, agent_id: str, key: str, value: Any) -> bool:
         """Store memory value for agent"""
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.base_url}/v1/agents/{agent_id}/memory",
-                    json={"key": key, "value": value},
-                    timeout=10.0,
-                )
-                if response.status_code == 200:
-                    logger.info(f"Stored memory for {agent_id}: {key}")
-                    return True
-                else:
-                    logger.error(f"Failed to store memory: {response.status_code}")
-                    return False
-        except Exception as e:
-            logger.error(f"Failed to store memory: {e}")
+        response = await self._request(
+            "POST",
+            f"/v1/agents/{agent_id}/memory",
+            "store memory",
+            json={"key": key, "value": value},
+        )
+        self._invalidate(agent_id, ("memory", agent_id, key))
+        if response is None:
             return False
+        logger.info(f"Stored memory for {agent_id}: {key}")
+        return True
 
     async def delete_memory(self, agent_id: str, key: str) -> bool:
         """Delete memory value for agent"""
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.delete(
-                    f"{self.base_url}/v1/agents/{agent_id}/memory",
-                    params={"key": key},
-                    timeout=10.0,
-                )
-                if response.status_code == 200:
-                    logger.info(f"Deleted memory for {agent_id}: {key}")
-                    return True
-                else:
-                    logger.error(f"Failed to delete memory: {response.status_code}")
-                    return False
-        except Exception as e:
-            logger.error(f"Failed to delete memory: {e}")
+        response = await self._request(
+            "DELETE",
+            f"/v1/agents/{agent_id}/memory",
+            "delete memory",
+            params={"key": key},
+        )
+        self._invalidate(agent_id, ("memory", agent_id, key))
+        if response is None:
             return False
+        logger.info(f"Deleted memory for {agent_id}: {key}")
+        return True
 
     async def search_memory(self, agent_id: str, query: str, limit: int = 10) -> list:
         """Search agent memory"""
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.base_url}/v1/agents/{agent_id}/memory/search",
-                    params={"query": query, "limit": limit},
-                    timeout=10.0,
-                )
-                if response.status_code == 200:
-                    data = response.json()
-                    return data.get("results", [])
-                else:
-                    logger.error(f"Failed to search memory: {response.status_code}")
-                    return []
-        except Exception as e:
-            logger.error(f"Failed to search memory: {e}")
+        response = await self._request(
+            "GET",
+            f"/v1/agents/{agent_id}/memory/search",
+            "search memory",
+            params={"query": query, "limit": limit},
+        )
+        if response is None:
             return []
+        return json_loads(response.content).get("results", [])
 
     async def list_agents(self) -> list:
         """List all agents"""
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(f"{self.base_url}/v1/agents/", timeout=10.0)
-                if response.status_code == 200:
-                    data = response.json()
-                    return data.get("agents", [])
-                else:
-                    logger.error(f"Failed to list agents: {response.status_code}")
-                    return []
-        except Exception as e:
-            logger.error(f"Failed to list agents: {e}")
+        response = await self._request("GET", "/v1/agents/", "list agents")
+        if response is None:
             return []
+        return json_loads(response.content).get("agents", [])
 
     async def create_agent(self, agent_config: Dict[str, Any]) -> Optional[str]:
         """Create a new agent"""
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.base_url}/v1/agents/", json=agent_config, timeout=30.0
-                )
-                if response.status_code == 200:
-                    data = response.json()
-                    agent_id = data.get("agent_id")
-                    logger.info(f"Created agent: {agent_id}")
-                    return agent_id
-                else:
-                    logger.error(f"Failed to create agent: {response.status_code}")
-                    return None
-        except Exception as e:
-            logger.error(f"Failed to create agent: {e}")
+        response = await self._request(
+            "POST", "/v1/agents/", "create agent", json=agent_config, timeout=30.0
+        )
+        if response is None:
             return None
+        agent_id = json_loads(response.content).get("agent_id")
+        logger.info(f"Created agent: {agent_id}")
+        return agent_id
 
     async def get_agent(self, agent_id: str) -> Optional[Dict[str, Any]]:
         """Get agent information"""
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.base_url}/v1/agents/{agent_id}", timeout=10.0
-                )
-                if response.status_code == 200:
-                    return response.json()
-                else:
-                    logger.error(f"Failed to get agent: {response.status_code}")
-                    return None
-        except Exception as e:
-            logger.error(f"Failed to get agent: {e}")
+        cache_key = ("agent", agent_id)
+        agent = self._cache_get(cache_key)
+        if agent is not _MISSING:
+            return agent
+        generation = self._generation(agent_id)
+
+        response = await self._request("GET", f"/v1/agents/{agent_id}", "get agent")
+        if response is None:
             return None
+        agent = json_loads(response.content)
+        self._cache_put(cache_key, agent, generation)
+        return agent
 
     async def send_message(self, agent_id: str, message: str) -> Optional[str]:
         """Send message to agent"""
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.base_url}/v1/agents/{agent_id}/messages",
-                    json={"message": message},
-                    timeout=30.0,
-                )
-                if response.status_code == 200:
-                    data = response.json()
-                    return data.get("response")
-                else:
-                    logger.error(f"Failed to send message: {response.status_code}")
-                    return None
-        except Exception as e:
-            logger.error(f"Failed to send message: {e}")
+        response = await self._request(
+            "POST",
+            f"/v1/agents/{agent_id}/messages",
+            "send message",
+            json={"message": message},
+            timeout=30.0,
+        )
+        # Handling a message can update the agent's state and its own memory
+        self._invalidate(
+            agent_id,
+            ("agent", agent_id),
+            *[k for k in self._cache if k[0] == "memory" and k[1] == agent_id],
+        )
+        if response is None:
             return None
+        return json_loads(response.content).get("response")